@@ -1,7 +1,10 @@
+from collections import deque
 from dataclasses import dataclass
-from typing import List
+from typing import Deque, List
 from datetime import datetime, timezone
 
+import numpy as np
+
 
 @dataclass
 class AlertRule:
@@ -17,31 +20,56 @@ class AlertEvent:
     message: str
 
 
+_DIRECTION_CODES = {"both": 0, "above": 1, "below": 2}
+MAX_RECENT_EVENTS = 20  # events kept for display
+
+
 class AlertManager:
     def __init__(self):
         self.rules: List[AlertRule] = []
-        self.events: List[AlertEvent] = []
+        self.events: Deque[AlertEvent] = deque(maxlen=MAX_RECENT_EVENTS)
+        # Display lines are formatted once, when the event fires
+        self._formatted: Deque[str] = deque(maxlen=MAX_RECENT_EVENTS)
+        self._reset_arrays()
+
+    def _reset_arrays(self):
+        # Structure-of-Arrays mirror of self.rules for vectorised evaluation
+        self._sy = np.empty(0, dtype=object)
+        self._sx = np.empty(0, dtype=object)
+        self._thr = np.empty(0, dtype=np.float64)
+        self._dir = np.empty(0, dtype=np.int8)
 
     def add_rule(self, rule: AlertRule):
         self.rules.append(rule)
+        self._sy = np.append(self._sy, np.array([rule.symbol_y], dtype=object))
+        self._sx = np.append(self._sx, np.array([rule.symbol_x], dtype=object))
+        self._thr = np.append(self._thr, float(rule.threshold))
+        self._dir = np.append(self._dir, np.int8(_DIRECTION_CODES.get(rule.direction, -1)))
 
     def clear_rules(self):
         self.rules.clear()
+        self._reset_arrays()
 
     def clear_events(self):
         self.events.clear()
+        self._formatted.clear()
+
+    def recent_text(self) -> str:
+        return "\n".join(self._formatted)
 
     def evaluate(self, symbol_y: str, symbol_x: str, z_last: float):
         if z_last is None or z_last != z_last:  # NaN check
             return
-        for r in self.rules:
-            if r.symbol_y == symbol_y and r.symbol_x == symbol_x:
-                fire = False
-                if r.direction == "both" and abs(z_last) >= r.threshold:
-                    fire = True
-                elif r.direction == "above" and z_last >= r.threshold:
-                    fire = True
-                elif r.direction == "below" and z_last <= -r.threshold:
-                    fire = True
-                if fire:
-                    self.events.append(AlertEvent(datetime.now(timezone.utc), f"Alert {symbol_y}/{symbol_x}: z={z_last:.2f} threshold={r.threshold}"))
+        if not self.rules:
+            return
+        mask = (self._sy == symbol_y) & (self._sx == symbol_x)
+        fire = mask & (
+            ((self._dir == 0) & (abs(z_last) >= self._thr))
+            | ((self._dir == 1) & (z_last >= self._thr))
+            | ((self._dir == 2) & (z_last <= -self._thr))
+        )
+        for i in np.nonzero(fire)[0]:
+            r = self.rules[i]
+            ev = AlertEvent(datetime.now(timezone.utc), f"Alert {symbol_y}/{symbol_x}: z={z_last:.2f} threshold={r.threshold}")
+            self.events.append(ev)
+            self._formatted.append(f"[{ev.ts.isoformat()}] {ev.message}")
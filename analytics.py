@@ -1,10 +1,16 @@
+import os
+import threading
+import time
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Dict, Optional, Tuple
 
+# Must be set before numba is imported; keeps compiled kernels next to the app's other data
+os.environ.setdefault("NUMBA_CACHE_DIR", str(Path("./data/.numba_cache").resolve()))
+
+import numba
 import numpy as np
 import pandas as pd
-from statsmodels.regression.linear_model import OLS
-from statsmodels.tools import add_constant
 from statsmodels.tsa.stattools import adfuller
 
 
@@ -16,53 +22,330 @@ class PairAnalytics:
     zscore_last: float
     adf_pvalue: Optional[float]
     corr_last: Optional[float]
+    # Full series, returned so callers (e.g. charts) don't recompute them
+    spread: Optional[pd.Series] = None
+    zscore: Optional[pd.Series] = None
+    corr: Optional[pd.Series] = None
+
+
+def _index_values(index: pd.Index) -> np.ndarray:
+    return index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy()
+
+
+def inner_align(y: pd.Series, x: pd.Series) -> Tuple[pd.Index, np.ndarray, np.ndarray]:
+    # Inner join on the (unique, sorted) index plus NaN drop, without pandas' outer-join alignment
+    iy_vals, ix_vals = _index_values(y.index), _index_values(x.index)
+    if iy_vals.shape == ix_vals.shape and np.array_equal(iy_vals, ix_vals):
+        idx, yv, xv = y.index, y.to_numpy(dtype=np.float64), x.to_numpy(dtype=np.float64)
+    else:
+        _, iy, ix = np.intersect1d(iy_vals, ix_vals, assume_unique=True, return_indices=True)
+        idx, yv, xv = y.index[iy], y.to_numpy(dtype=np.float64)[iy], x.to_numpy(dtype=np.float64)[ix]
+    valid = ~(np.isnan(yv) | np.isnan(xv))
+    if not valid.all():
+        idx, yv, xv = idx[valid], yv[valid], xv[valid]
+    return idx, yv, xv
 
 
 def compute_hedge_ratio(y: pd.Series, x: pd.Series, add_intercept: bool = True) -> Tuple[float, float]:
-    df = pd.concat([y.rename("y"), x.rename("x")], axis=1).dropna()
-    if df.empty or df.shape[0] < 10:
+    _, yv, xv = inner_align(y, x)
+    return _ols(yv, xv, add_intercept)
+
+
+def _ols(yv: np.ndarray, xv: np.ndarray, add_intercept: bool) -> Tuple[float, float]:
+    if yv.shape[0] < 10:
+        return 1.0, 0.0
+    # Closed-form OLS for a single regressor: no design matrix, just dot products
+    if not add_intercept:
+        sxx = float(np.dot(xv, xv))
+        return (float(np.dot(xv, yv)) / sxx, 0.0) if sxx > 0 else (1.0, 0.0)
+    x_mean, y_mean = float(xv.mean()), float(yv.mean())
+    xc = xv - x_mean
+    sxx = float(np.dot(xc, xc))
+    if sxx <= 0:
         return 1.0, 0.0
-    X = add_constant(df["x"]) if add_intercept else df[["x"]]
-    model = OLS(df["y"], X).fit()
-    if add_intercept:
-        return float(model.params["x"]), float(model.params["const"])
-    return float(model.params["x"]), 0.0
+    beta = float(np.dot(xc, yv - y_mean)) / sxx
+    return beta, y_mean - beta * x_mean
+
+
+@dataclass
+class PairRegressionState:
+    # Sufficient statistics for y ~ beta * x (+ intercept), over values shifted by (x0, y0)
+    add_intercept: bool
+    index: np.ndarray
+    y: np.ndarray
+    x: np.ndarray
+    x0: float = 0.0
+    y0: float = 0.0
+    n: int = 0
+    sum_x: float = 0.0
+    sum_y: float = 0.0
+    sum_xx: float = 0.0
+    sum_xy: float = 0.0
+    updates: int = 0
+
+    @classmethod
+    def from_arrays(cls, index: np.ndarray, y: np.ndarray, x: np.ndarray, add_intercept: bool) -> "PairRegressionState":
+        # Shifting by the first observation keeps the sums small; OLS slope is shift invariant
+        x0, y0 = (float(x[0]), float(y[0])) if add_intercept else (0.0, 0.0)
+        state = cls(add_intercept=add_intercept, index=index, y=y, x=x, x0=x0, y0=y0)
+        state.apply(y, x, 1)
+        return state
+
+    def apply(self, y: np.ndarray, x: np.ndarray, sign: int):
+        if y.shape[0] == 0:
+            return
+        xs = x - self.x0
+        ys = y - self.y0
+        self.n += sign * int(y.shape[0])
+        self.sum_x += sign * float(xs.sum())
+        self.sum_y += sign * float(ys.sum())
+        self.sum_xx += sign * float(np.dot(xs, xs))
+        self.sum_xy += sign * float(np.dot(xs, ys))
+
+    def solve(self) -> Tuple[float, float]:
+        if not self.add_intercept:
+            if self.sum_xx <= 0:
+                return 1.0, 0.0
+            return self.sum_xy / self.sum_xx, 0.0
+        den = self.n * self.sum_xx - self.sum_x * self.sum_x
+        if self.n <= 0 or den <= 0:
+            return 1.0, 0.0
+        beta = (self.n * self.sum_xy - self.sum_x * self.sum_y) / den
+        intercept = (self.sum_y - beta * self.sum_x) / self.n
+        return beta, intercept + self.y0 - beta * self.x0
+
+
+_REGRESSION_STATES: Dict[Tuple[str, ...], PairRegressionState] = {}
+_REGRESSION_LOCK = threading.Lock()
+_REGRESSION_RESYNC_EVERY = 1000  # full recompute of the sums to bound floating-point drift
+_REGRESSION_STATES_MAX = 64  # one state per pair shown; oldest are dropped beyond this
+# Below this many rows a closed-form refit is cheaper than the bookkeeping of an incremental update
+_REGRESSION_INCREMENTAL_MIN_ROWS = 20_000
+
+
+def compute_hedge_ratio_incremental(pair: Tuple[str, ...], y: pd.Series, x: pd.Series, add_intercept: bool = True) -> Tuple[float, float]:
+    index, yv, xv = inner_align(y, x)
+    if yv.shape[0] < _REGRESSION_INCREMENTAL_MIN_ROWS:
+        if pair in _REGRESSION_STATES:
+            with _REGRESSION_LOCK:
+                _REGRESSION_STATES.pop(pair, None)
+        return _ols(yv, xv, add_intercept)
+    idx = _index_values(index)
+    with _REGRESSION_LOCK:
+        state = _REGRESSION_STATES.get(pair)
+        if state is None or state.add_intercept != add_intercept:
+            # New pair (or regression spec): seed from a full fit
+            _REGRESSION_STATES.pop(pair, None)
+            while len(_REGRESSION_STATES) >= _REGRESSION_STATES_MAX:
+                _REGRESSION_STATES.pop(next(iter(_REGRESSION_STATES)))
+            state = _REGRESSION_STATES[pair] = PairRegressionState.from_arrays(idx, yv, xv, add_intercept)
+            return state.solve()
+
+        # Both indexes are sorted: the previous snapshot is [evicted head | shared rows] and the new one
+        # is [shared rows | appended tail], so two O(log n) lookups replace a full intersection
+        old = state.index
+        k = int(np.searchsorted(old, idx[0]))  # rows evicted from the head
+        m = old.shape[0] - k  # rows shared with the new snapshot
+        state.updates += 1
+        if (
+            state.updates >= _REGRESSION_RESYNC_EVERY
+            or m <= 0
+            or m > idx.shape[0]
+            or k >= m
+            or old[k] != idx[0]
+            or old[-1] != idx[m - 1]
+        ):
+            # Snapshots don't line up (gaps, restart) or most rows changed: refit from scratch
+            state = _REGRESSION_STATES[pair] = PairRegressionState.from_arrays(idx, yv, xv, add_intercept)
+            return state.solve()
+        state.apply(state.y[:k], state.x[:k], -1)
+        # Closed bars don't change; only the last shared bar (the open one) can have moved
+        j = m - 1
+        if state.y[-1] != yv[j] or state.x[-1] != xv[j]:
+            state.apply(state.y[-1:], state.x[-1:], -1)
+            state.apply(yv[j:j + 1], xv[j:j + 1], 1)
+        state.apply(yv[m:], xv[m:], 1)
+        state.index, state.y, state.x = idx, yv, xv
+        return state.solve()
+
+
+# Explicit signature: compiled (or loaded from the disk cache) at import, not on the first Dash callback.
+# The input is typed read-only so it accepts both writable arrays and pandas' copy-on-write views.
+_F8_READONLY = numba.types.Array(numba.float64, 1, "C", readonly=True)
+
+
+@numba.njit(
+    numba.types.UniTuple(numba.float64[::1], 2)(_F8_READONLY, numba.int64, numba.int64),
+    cache=True,
+    boundscheck=False,
+)
+def _rolling_mean_std_kernel(x: np.ndarray, w: int, min_p: int) -> Tuple[np.ndarray, np.ndarray]:
+    n_total = x.shape[0]
+    mean = np.full(n_total, np.nan)
+    std = np.full(n_total, np.nan)
+    n = 0
+    s1 = 0.0
+    c1 = 0.0  # Kahan compensation for s1
+    s2 = 0.0
+    c2 = 0.0  # Kahan compensation for s2
+    for i in range(n_total):
+        v = x[i]
+        if v == v:
+            n += 1
+            t = v - c1
+            u = s1 + t
+            c1 = (u - s1) - t
+            s1 = u
+            t = v * v - c2
+            u = s2 + t
+            c2 = (u - s2) - t
+            s2 = u
+        if i >= w:
+            v = x[i - w]
+            if v == v:
+                n -= 1
+                t = -v - c1
+                u = s1 + t
+                c1 = (u - s1) - t
+                s1 = u
+                t = -v * v - c2
+                u = s2 + t
+                c2 = (u - s2) - t
+                s2 = u
+        if n >= min_p and n > 0:
+            m = s1 / n
+            mean[i] = m
+            std[i] = np.sqrt(max(s2 / n - m * m, 0.0))
+    return mean, std
+
+
+def rolling_mean_std(x: np.ndarray, w: int, min_p: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Single pass O(n) rolling mean / population std (ddof=0); NaNs are skipped like pandas
+    if int(w) < 1:
+        # The kernel is compiled without bounds checks; a non-positive window would read past the array
+        raise ValueError(f"window must be >= 1, got {w}")
+    return _rolling_mean_std_kernel(np.ascontiguousarray(x, dtype=np.float64), int(w), int(min_p))
 
 
 def compute_spread_zscore(y: pd.Series, x: pd.Series, beta: float, intercept: float = 0.0, window: int = 100) -> Tuple[pd.Series, pd.Series]:
     s = y - (beta * x + intercept)
-    m = s.rolling(window, min_periods=max(10, window // 5)).mean()
-    sd = s.rolling(window, min_periods=max(10, window // 5)).std(ddof=0)
-    z = (s - m) / sd
+    m, sd = rolling_mean_std(s.to_numpy(), window, max(10, window // 5))
+    # A flat window (sd == 0) means the spread sits at its mean: z = 0, not 0/0; NaN only during warm-up
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(sd > 0, (s.to_numpy() - m) / sd, np.where(sd == 0, 0.0, np.nan))
+    z = pd.Series(z, index=s.index)
     return s, z
 
 
+def rolling_corr_fast(y: np.ndarray, x: np.ndarray, w: int) -> np.ndarray:
+    # Window sums from cumulative sums of x, y, xy, x^2, y^2; inputs must be aligned and NaN-free
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n = y.shape[0]
+    out = np.full(n, np.nan)
+    if w < 2 or n < w:
+        return out
+    # Correlation is shift invariant; centering keeps the cumulative sums small
+    y = y - y.mean()
+    x = x - x.mean()
+
+    def window_sum(a: np.ndarray) -> np.ndarray:
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        return c[w:] - c[:-w]
+
+    s_x, s_y = window_sum(x), window_sum(y)
+    s_xy, s_xx, s_yy = window_sum(x * y), window_sum(x * x), window_sum(y * y)
+    num = w * s_xy - s_x * s_y
+    den = (w * s_xx - s_x * s_x) * (w * s_yy - s_y * s_y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.where(den > 0, num / np.sqrt(den), np.nan)
+    out[w - 1:] = np.clip(corr, -1.0, 1.0)
+    return out
+
+
 def compute_corr(y: pd.Series, x: pd.Series, window: int = 100) -> pd.Series:
-    df = pd.concat([y.rename("y"), x.rename("x")], axis=1).dropna()
-    return df["y"].rolling(window).corr(df["x"]) if not df.empty else pd.Series(dtype=float)
+    idx, yv, xv = inner_align(y, x)
+    if yv.shape[0] == 0:
+        return pd.Series(dtype=float)
+    return pd.Series(rolling_corr_fast(yv, xv, window), index=idx)
 
 
 def adf_test(series: pd.Series, maxlag: Optional[int] = None) -> Optional[float]:
     s = series.dropna()
     if s.shape[0] < 20:
         return None
+    if maxlag is None:
+        # Schwert's rule; a fixed lag avoids the per-lag OLS sweep of autolag="AIC"
+        maxlag = int(12 * (s.shape[0] / 100) ** 0.25)
     try:
-        res = adfuller(s.values, maxlag=maxlag, autolag="AIC")
+        res = adfuller(s.values, maxlag=maxlag, autolag=None)
         return float(res[1])  # p-value
     except Exception:
         return None
 
 
-def build_pair_analytics(y_close: pd.Series, x_close: pd.Series, window: int = 100, add_intercept: bool = True) -> PairAnalytics:
-    beta, intercept = compute_hedge_ratio(y_close, x_close, add_intercept=add_intercept)
+_ADF_CACHE: Dict[tuple, Optional[float]] = {}
+_ADF_CACHE_MAX = 256
+_ADF_LOCK = threading.Lock()  # Dash callbacks run on several threads
+ADF_REFRESH_SECONDS = 5
+
+
+def adf_test_cached(series: pd.Series, pair: Optional[Tuple[str, str]] = None, timeframe: Optional[str] = None) -> Optional[float]:
+    s = series.dropna()
+    n = s.shape[0]
+    if n < 20:
+        return None
+    bucket = int(time.monotonic() // ADF_REFRESH_SECONDS)
+    if pair is not None:
+        # Beta is re-estimated every tick, which shifts every spread value, and a new bar changes n every
+        # second at 1s bars; key on the pair alone so the test reruns at most once per ADF_REFRESH_SECONDS
+        key = (pair, timeframe, bucket)
+    else:
+        v = s.to_numpy()
+        key = (n, float(v[0]), float(v[n // 2]), float(v[-1]), bucket)
+    with _ADF_LOCK:
+        if key in _ADF_CACHE:
+            return _ADF_CACHE[key]
+    # Run the test outside the lock; two threads may both compute a missing key, which is harmless
+    p = adf_test(s)
+    with _ADF_LOCK:
+        _ADF_CACHE[key] = p
+        while len(_ADF_CACHE) > _ADF_CACHE_MAX:
+            _ADF_CACHE.pop(next(iter(_ADF_CACHE)))
+    return p
+
+
+def last_valid(s: pd.Series) -> float:
+    # Last non-NaN value via a reverse scan; NaNs from the rolling kernels only occur at the head
+    v = s.to_numpy()
+    i = len(v) - 1
+    while i >= 0 and v[i] != v[i]:
+        i -= 1
+    return float(v[i]) if i >= 0 else float("nan")
+
+
+def build_pair_analytics(y_close: pd.Series, x_close: pd.Series, window: int = 100, add_intercept: bool = True, pair: Optional[Tuple[str, str]] = None, timeframe: Optional[str] = None) -> PairAnalytics:
+    # Align once; the helpers below hit inner_align's identical-index fast path
+    idx, yv, xv = inner_align(y_close, x_close)
+    y_close, x_close = pd.Series(yv, index=idx), pd.Series(xv, index=idx)
+    if pair is not None:
+        # Bars of different timeframes are different series; keep their regression states apart
+        state_key = pair if timeframe is None else (*pair, timeframe)
+        beta, intercept = compute_hedge_ratio_incremental(state_key, y_close, x_close, add_intercept=add_intercept)
+    else:
+        beta, intercept = compute_hedge_ratio(y_close, x_close, add_intercept=add_intercept)
     spread, z = compute_spread_zscore(y_close, x_close, beta, intercept, window=window)
-    p_adf = adf_test(spread)
+    p_adf = adf_test_cached(spread, pair=pair, timeframe=timeframe)
     corr = compute_corr(y_close, x_close, window=window)
+    corr_last = last_valid(corr)
     return PairAnalytics(
         beta=beta,
         intercept=intercept,
-        spread_last=float(spread.dropna().iloc[-1]) if not spread.dropna().empty else float("nan"),
-        zscore_last=float(z.dropna().iloc[-1]) if not z.dropna().empty else float("nan"),
+        spread_last=last_valid(spread),
+        zscore_last=last_valid(z),
         adf_pvalue=p_adf,
-        corr_last=float(corr.dropna().iloc[-1]) if not corr.dropna().empty else None,
+        corr_last=corr_last if corr_last == corr_last else None,
+        spread=spread,
+        zscore=z,
+        corr=corr,
     )
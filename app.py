@@ -1,3 +1,4 @@
+import io
 import threading
 from pathlib import Path
 from datetime import datetime, timezone
@@ -7,9 +8,11 @@ import numpy as np
 import pandas as pd
 from dash import Dash, Input, Output, State, dcc, html
 import plotly.graph_objects as go
+import pyarrow
+import pyarrow.csv
 
 from market_data import MarketDataManager
-from analytics import build_pair_analytics
+from analytics import build_pair_analytics, inner_align
 from alerts import AlertManager, AlertRule
 from storage import Storage
 
@@ -19,11 +22,16 @@ DB_PATH = DATA_DIR / "market.db"
 
 mdm = MarketDataManager(max_ticks_per_symbol=300_000)
 alerts = AlertManager()
-storage = Storage(DB_PATH)
+# OHLCV snapshots are persisted by Storage's background writer so SQLite commits stay off the callback thread.
+# If the writer falls behind, snapshots are dropped rather than blocking the callback; the next tick re-sends the bars.
+storage = Storage(DB_PATH, background=True, drop_when_full=True)
+# Last PairAnalytics, keyed by inputs + tick versions so unchanged data skips the recompute
+_analytics_cache: dict = {}
 
 
 DEFAULT_SYMBOLS = ["btcusdt", "ethusdt"]
 TIMEFRAMES = {"1s": "1s", "1m": "1min", "5m": "5min"}
+MAX_PLOT_POINTS = 2000  # per trace; more than a chart can show at its pixel width
 
 THEME = {
     "bg": "#0b1220",
@@ -49,6 +57,57 @@ def card_style(extra=None):
     return base
 
 
+# Shared chart styling, built once; per-chart title/height/axis overrides are merged in chart_layout
+_BASE_LAYOUT = dict(
+    template="plotly_dark",
+    paper_bgcolor=THEME["card"],
+    plot_bgcolor=THEME["card"],
+    font_color=THEME["text"],
+    margin=dict(l=40, r=20, t=60, b=40),
+)
+
+
+def chart_layout(title: str, height: int, xaxis=None, yaxis=None, **extra) -> dict:
+    layout = dict(
+        _BASE_LAYOUT,
+        title=title,
+        height=height,
+        xaxis=dict(gridcolor=THEME["border"], **(xaxis or {})),
+        yaxis=dict(gridcolor=THEME["border"], **(yaxis or {})),
+    )
+    layout.update(extra)
+    return layout
+
+
+def empty_figures(sy: str, sx: str):
+    return (
+        go.Figure(layout=chart_layout(f"{sy.upper()} Price", 300)),
+        go.Figure(layout=chart_layout(f"{sx.upper()} Price", 300)),
+        go.Figure(layout=chart_layout("Spread", 280)),
+        go.Figure(layout=chart_layout("Z-Score", 280)),
+        go.Figure(layout=chart_layout("Rolling Correlation", 260)),
+    )
+
+
+def zthr_lines(zthr: float):
+    # Same shapes fig.add_hline would add, but passed with the layout
+    line = dict(color="red", dash="dot")
+    return [
+        dict(type="line", xref="x domain", x0=0, x1=1, yref="y", y0=y, y1=y, line=line)
+        for y in (zthr, -zthr)
+    ]
+
+
+def decimate(idx: pd.Index, y: pd.Series, target: int = MAX_PLOT_POINTS):
+    # Stride-downsample to at most `target` points, always keeping the latest value
+    n = len(y)
+    if n <= target:
+        return idx, y
+    step = -(-n // target)
+    pos = np.arange((n - 1) % step, n, step)
+    return idx[pos], y.iloc[pos]
+
+
 app = Dash(__name__)
 server = app.server
 
@@ -125,6 +184,11 @@ app.layout = html.Div([
 })
 
 
+def persist_snapshot(symbol: str, tf_rule: str, df: pd.DataFrame):
+    # Only enqueues; overlapping snapshots are merged per bar by the writer
+    storage.upsert_ohlcv(df, symbol, tf_rule)
+
+
 def start_stream(symbols: List[str]):
     mdm.start(symbols)
 
@@ -147,39 +211,20 @@ def start_stream(symbols: List[str]):
 def update_live(_, sy, sx, tf_rule, window, zthr):
     sy = (sy or "").lower().strip()
     sx = (sx or "").lower().strip()
-    window = int(window or 100)
+    window = max(2, int(window or 100))  # the input accepts any number; rolling stats need >= 2
     zthr = float(zthr or 2)
 
-    # Pull latest data
+    # Pull latest data (versions are read first so a cache key never claims newer data than it holds)
+    versions = (mdm.version(sy), mdm.version(sx))
     ohlc_y = mdm.resample_ohlcv(sy, tf_rule)
     ohlc_x = mdm.resample_ohlcv(sx, tf_rule)
 
     # Persist snapshots (lightweight)
-    storage.upsert_ohlcv(ohlc_y.tail(5), sy, tf_rule)
-    storage.upsert_ohlcv(ohlc_x.tail(5), sx, tf_rule)
+    persist_snapshot(sy, tf_rule, ohlc_y.tail(5))
+    persist_snapshot(sx, tf_rule, ohlc_x.tail(5))
 
     # Analytics
-    def themed_fig(title: str, height: int = 320):
-        fig = go.Figure()
-        fig.update_layout(
-            title=title,
-            template="plotly_dark",
-            paper_bgcolor=THEME["card"],
-            plot_bgcolor=THEME["card"],
-            font_color=THEME["text"],
-            margin=dict(l=40, r=20, t=60, b=40),
-            height=height,
-            xaxis=dict(gridcolor=THEME["border"]),
-            yaxis=dict(gridcolor=THEME["border"]),
-        )
-        return fig
-
-    price_y_fig = themed_fig(f"{sy.upper()} Price", height=300)
-    price_x_fig = themed_fig(f"{sx.upper()} Price", height=300)
-    spread_fig = themed_fig("Spread", height=280)
-    zscore_fig = themed_fig("Z-Score", height=280)
-    corr_fig = themed_fig("Rolling Correlation", height=260)
-
+    figures = None
     stats_cards = html.Div(
         card_style({"display": "grid", "gridTemplateColumns": "repeat(auto-fit, minmax(180px, 1fr))", "gap": "10px"})
     )
@@ -188,54 +233,74 @@ def update_live(_, sy, sx, tf_rule, window, zthr):
 
     if not ohlc_y.empty and not ohlc_x.empty:
         # Align on index
-        df = pd.concat({sy: ohlc_y["close"], sx: ohlc_x["close"]}, axis=1).dropna()
+        idx, y_close, x_close = inner_align(ohlc_y["close"], ohlc_x["close"])
+        df = pd.DataFrame({sy: y_close, sx: x_close}, index=idx)
         if df.shape[0] > 10:
-            pa = build_pair_analytics(df[sy], df[sx], window=window, add_intercept=True)
+            cache_key = (sy, sx, tf_rule, window) + versions
+            pa = _analytics_cache.get(cache_key)
+            if pa is None:
+                pa = build_pair_analytics(df[sy], df[sx], window=window, add_intercept=True, pair=(sy, sx), timeframe=tf_rule)
+                _analytics_cache.clear()
+                _analytics_cache[cache_key] = pa
 
             # Charts
             # Y symbol price
             y_min, y_max = df[sy].min(), df[sy].max()
             pad_y = max((y_max - y_min) * 0.02, (y_max + y_min) * 0.0002)
-            price_y_fig.add_trace(go.Scatter(x=df.index, y=df[sy], name=f"{sy.upper()} Close", line=dict(color=THEME["accent"])))
-            price_y_fig.update_layout(
-                title=f"{sy.upper()} Price ({tf_rule})",
-                xaxis_title="Time",
-                yaxis_title="Price",
-                yaxis=dict(range=[y_min - pad_y, y_max + pad_y])
+            xs, ys = decimate(df.index, df[sy])
+            price_y_fig = go.Figure(
+                data=[go.Scattergl(x=xs, y=ys, name=f"{sy.upper()} Close", line=dict(color=THEME["accent"]))],
+                layout=chart_layout(
+                    f"{sy.upper()} Price ({tf_rule})", 300,
+                    xaxis=dict(title="Time"),
+                    yaxis=dict(title="Price", range=[y_min - pad_y, y_max + pad_y]),
+                ),
             )
             
             # X symbol price
             x_min, x_max = df[sx].min(), df[sx].max()
             pad_x = max((x_max - x_min) * 0.02, (x_max + x_min) * 0.0002)
-            price_x_fig.add_trace(go.Scatter(x=df.index, y=df[sx], name=f"{sx.upper()} Close", line=dict(color=THEME["accent2"])))
-            price_x_fig.update_layout(
-                title=f"{sx.upper()} Price ({tf_rule})",
-                xaxis_title="Time",
-                yaxis_title="Price",
-                yaxis=dict(range=[x_min - pad_x, x_max + pad_x])
+            xs, ys = decimate(df.index, df[sx])
+            price_x_fig = go.Figure(
+                data=[go.Scattergl(x=xs, y=ys, name=f"{sx.upper()} Close", line=dict(color=THEME["accent2"]))],
+                layout=chart_layout(
+                    f"{sx.upper()} Price ({tf_rule})", 300,
+                    xaxis=dict(title="Time"),
+                    yaxis=dict(title="Price", range=[x_min - pad_x, x_max + pad_x]),
+                ),
             )
 
-            spread, z = df[sy] - (pa.beta * df[sx] + pa.intercept), None
-            m = spread.rolling(window, min_periods=max(10, window // 5)).mean()
-            sd = spread.rolling(window, min_periods=max(10, window // 5)).std(ddof=0)
-            z = (spread - m) / sd
+            spread, z = pa.spread, pa.zscore
             # Spread
             s_min, s_max = spread.min(), spread.max()
             pad_s = max((s_max - s_min) * 0.1, 0.05)
-            spread_fig.add_trace(go.Scatter(x=spread.index, y=spread, name="Spread", line=dict(color=THEME["accent"])))
-            spread_fig.update_layout(title="Spread", xaxis_title="Time", yaxis=dict(range=[s_min - pad_s, s_max + pad_s]))
+            xs, ys = decimate(spread.index, spread)
+            spread_fig = go.Figure(
+                data=[go.Scattergl(x=xs, y=ys, name="Spread", line=dict(color=THEME["accent"]))],
+                layout=chart_layout("Spread", 280, xaxis=dict(title="Time"), yaxis=dict(range=[s_min - pad_s, s_max + pad_s])),
+            )
             
             # Z-Score
             z_min, z_max = z.min(), z.max()
             pad_z = max((z_max - z_min) * 0.1, 0.5)
-            zscore_fig.add_trace(go.Scatter(x=z.index, y=z, name="Z-Score", line=dict(color="#f97316")))
-            zscore_fig.add_hline(y=zthr, line=dict(color="red", dash="dot"))
-            zscore_fig.add_hline(y=-zthr, line=dict(color="red", dash="dot"))
-            zscore_fig.update_layout(title="Z-Score", xaxis_title="Time", yaxis=dict(range=[z_min - pad_z, z_max + pad_z]))
+            xs, ys = decimate(z.index, z)
+            zscore_fig = go.Figure(
+                data=[go.Scattergl(x=xs, y=ys, name="Z-Score", line=dict(color="#f97316"))],
+                layout=chart_layout(
+                    "Z-Score", 280,
+                    xaxis=dict(title="Time"),
+                    yaxis=dict(range=[z_min - pad_z, z_max + pad_z]),
+                    shapes=zthr_lines(zthr),
+                ),
+            )
 
-            corr = df[sy].rolling(window).corr(df[sx])
-            corr_fig.add_trace(go.Scatter(x=corr.index, y=corr, name="Rolling Corr", line=dict(color=THEME["accent2"])))
-            corr_fig.update_layout(title=f"Rolling Correlation (window={window})")
+            corr = pa.corr
+            xs, ys = decimate(corr.index, corr)
+            corr_fig = go.Figure(
+                data=[go.Scattergl(x=xs, y=ys, name="Rolling Corr", line=dict(color=THEME["accent2"]))],
+                layout=chart_layout(f"Rolling Correlation (window={window})", 260),
+            )
+            figures = (price_y_fig, price_x_fig, spread_fig, zscore_fig, corr_fig)
 
             def fmt(x, digits=3):
                 if x is None or (isinstance(x, float) and np.isnan(x)):
@@ -274,9 +339,11 @@ def update_live(_, sy, sx, tf_rule, window, zthr):
             alerts.clear_rules()
             alerts.add_rule(AlertRule(symbol_y=sy, symbol_x=sx, threshold=zthr, direction="both"))
             alerts.evaluate(sy, sx, pa.zscore_last)
-            latest_alerts = "\n".join([f"[{a.ts.isoformat()}] {a.message}" for a in alerts.events][-20:])
+            latest_alerts = alerts.recent_text()
 
-    return stats_cards, price_y_fig, price_x_fig, spread_fig, zscore_fig, corr_fig, latest_alerts
+    if figures is None:
+        figures = empty_figures(sy, sx)
+    return (stats_cards, *figures, latest_alerts)
 
 
 @app.callback(
@@ -321,9 +388,11 @@ def download_csv(_, sy, sx, tf_rule):
     sx = (sx or "").lower().strip()
     oy = mdm.resample_ohlcv(sy, tf_rule)
     ox = mdm.resample_ohlcv(sx, tf_rule)
-    df = pd.concat({f"{sy}_close": oy["close"], f"{sx}_close": ox["close"]}, axis=1)
-    csv = df.to_csv()
-    return dict(content=csv, filename=f"processed_{sy}_{sx}_{tf_rule}.csv")
+    idx, y_close, x_close = inner_align(oy["close"], ox["close"])
+    table = pyarrow.table({"ts": pyarrow.array(idx), f"{sy}_close": y_close, f"{sx}_close": x_close})
+    buf = io.BytesIO()
+    pyarrow.csv.write_csv(table, buf)  # multithreaded C++ writer
+    return dcc.send_bytes(buf.getvalue(), f"processed_{sy}_{sx}_{tf_rule}.csv")
 
 
 @app.callback(
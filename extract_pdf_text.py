@@ -1,6 +1,29 @@
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# Below this page count, process start-up costs more than it saves
+PARALLEL_MIN_PAGES = 8
+
+
+def _page_text(page):
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        return ""
+
+
+def _extract_page(args):
+    # Worker: each process opens its own reader (PdfReader objects are not picklable)
+    from pypdf import PdfReader
+    path, i = args
+    try:
+        return _page_text(PdfReader(path).pages[i])
+    except Exception:
+        return ""
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: extract_pdf_text.py <pdf_path> [output_txt]")
@@ -17,15 +40,20 @@ def main():
         sys.exit(3)
 
     reader = PdfReader(str(pdf_path))
+    n_pages = len(reader.pages)
+    if n_pages >= PARALLEL_MIN_PAGES:
+        jobs = [(str(pdf_path), i) for i in range(n_pages)]
+        chunksize = max(1, n_pages // (4 * (os.cpu_count() or 1)))
+        with ProcessPoolExecutor() as ex:
+            texts = list(ex.map(_extract_page, jobs, chunksize=chunksize))
+    else:
+        texts = [_page_text(page) for page in reader.pages]
+
     parts = []
-    for i, page in enumerate(reader.pages):
-        try:
-            txt = page.extract_text() or ""
-        except Exception:
-            txt = ""
+    for i, txt in enumerate(texts):
         if txt and not txt.endswith("\n"):
             txt += "\n"
-        parts.append(txt + ("\n" if i < len(reader.pages) - 1 else ""))
+        parts.append(txt + ("\n" if i < n_pages - 1 else ""))
 
     content = "".join(parts)
     if len(sys.argv) >= 3:
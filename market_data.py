@@ -1,16 +1,20 @@
 import asyncio
-import json
 import threading
-from collections import deque, defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
+import orjson
 import pandas as pd
 import websockets
 
 
+# Cheap pre-parse filter for trade events (text frames arrive as str, binary as bytes)
+_TRADE_MARKER_STR = '"trade"'
+_TRADE_MARKER_BYTES = b'"trade"'
+
+
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
@@ -18,7 +22,7 @@ def utc_now_iso() -> str:
 @dataclass
 class Tick:
     symbol: str
-    ts: datetime
+    ts: int  # nanoseconds since epoch (UTC)
     price: float
     size: float
 
@@ -28,7 +32,7 @@ def normalize_trade(msg: dict) -> Optional[Tick]:
         symbol = msg["s"].lower()
         # Binance futures trade message has event time 'E' and trade time 'T'
         t = msg.get("T") or msg.get("E")
-        ts = datetime.fromtimestamp(t / 1000.0, tz=timezone.utc)
+        ts = int(t) * 1_000_000  # ms -> ns; converted to datetimes per snapshot in get_ticks_df
         price = float(msg["p"])  # price
         qty = float(msg["q"])  # quantity
         return Tick(symbol=symbol, ts=ts, price=price, size=qty)
@@ -38,7 +42,14 @@ def normalize_trade(msg: dict) -> Optional[Tick]:
 
 class MarketDataManager:
     def __init__(self, max_ticks_per_symbol: int = 200_000):
-        self._ticks: Dict[str, deque] = defaultdict(lambda: deque(maxlen=max_ticks_per_symbol))
+        self._capacity = max_ticks_per_symbol
+        # Per-symbol Structure-of-Arrays ring buffers: ts (ns since epoch), price, size.
+        # Each buffer has a single producer (its websocket task) and is read without locking;
+        # see _append_tick / _snapshot for the publication protocol.
+        self._buf: Dict[str, dict] = {}
+        # (symbol, rule) -> (written cursor at computation, OHLCV frame)
+        self._ohlcv_cache: Dict[Tuple[str, str], Tuple[int, pd.DataFrame]] = {}
+        # Control plane only (symbol list, subscriptions)
         self._lock = threading.RLock()
         self._symbols: List[str] = []
         self._ws_tasks: Dict[str, asyncio.Task] = {}
@@ -64,25 +75,181 @@ class MarketDataManager:
 
     def get_ticks_df(self, symbol: str, since_seconds: Optional[int] = None) -> pd.DataFrame:
         symbol = symbol.lower()
-        with self._lock:
-            arr = list(self._ticks[symbol])
-        if not arr:
+        buf = self._buf.get(symbol)
+        if buf is None or buf["written"] == 0:
             return pd.DataFrame(columns=["ts", "price", "size"]).set_index("ts")
-        df = pd.DataFrame([{ "ts": t.ts, "price": t.price, "size": t.size } for t in arr])
-        df = df.set_index("ts").sort_index()
+        ts, price, size, _, _ = self._snapshot(buf)
+        df = self._ticks_frame(ts, price, size)
         if since_seconds:
             cutoff = datetime.now(timezone.utc) - pd.Timedelta(seconds=since_seconds)
             df = df[df.index >= cutoff]
         return df
 
+    def version(self, symbol: str) -> int:
+        # Total ticks ever received for the symbol; changes whenever new data arrives
+        buf = self._buf.get(symbol.lower())
+        return buf["written"] if buf is not None else 0
+
     def resample_ohlcv(self, symbol: str, rule: str) -> pd.DataFrame:
-        df = self.get_ticks_df(symbol)
-        if df.empty:
-            return pd.DataFrame(columns=["open", "high", "low", "close", "volume"]) 
+        symbol = symbol.lower()
+        buf = self._buf.get(symbol)
+        if buf is None or buf["written"] == 0:
+            return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+        key = (symbol, rule)
+        written = buf["written"]
+        cached = self._ohlcv_cache.get(key)
+        if cached is not None and cached[0] == written:
+            return cached[1]
+        result = None
+        if cached is not None and not cached[1].empty:
+            result = self._extend_ohlcv(buf, rule, *cached)
+        if result is None:
+            ts, price, size, _, written = self._snapshot(buf)
+            result = self._resample(self._ticks_frame(ts, price, size), rule), written
+        self._ohlcv_cache[key] = (result[1], result[0])
+        return result[0]
+
+    @staticmethod
+    def _resample(df: pd.DataFrame, rule: str) -> pd.DataFrame:
         ohlc = df["price"].resample(rule).ohlc()
         vol = df["size"].resample(rule).sum().rename("volume")
-        out = pd.concat([ohlc, vol], axis=1).dropna(how="all")
-        return out
+        return pd.concat([ohlc, vol], axis=1).dropna(how="all")
+
+    def _extend_ohlcv(self, buf: dict, rule: str, last_written: int, prev: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, int]]:
+        # Fold ticks received since the cached snapshot into its trailing bar and append new bars.
+        # Returns None when an incremental update is not possible and a full resample is needed.
+        ts, price, size, start, written = self._snapshot(buf, from_seq=last_written)
+        if start != last_written:
+            return None  # ticks were evicted before we saw them
+        if ts.shape[0] == 0:
+            return prev, written
+        new = self._resample(self._ticks_frame(ts, price, size), rule)
+        last_bar = prev.index[-1]
+        if new.index[0] < last_bar:
+            return None  # out-of-order ticks reach into already closed bars
+        if new.index[0] == last_bar:
+            merged = new.iloc[:1].copy()
+            merged.iloc[0] = [
+                prev["open"].iloc[-1],
+                max(prev["high"].iloc[-1], new["high"].iloc[0]),
+                min(prev["low"].iloc[-1], new["low"].iloc[0]),
+                new["close"].iloc[0],
+                prev["volume"].iloc[-1] + new["volume"].iloc[0],
+            ]
+            out = pd.concat([prev.iloc[:-1], merged, new.iloc[1:]])
+        else:
+            out = pd.concat([prev, new])
+            # Keep the empty (NaN OHLC, zero volume) bars a full resample would produce in the gap
+            full = pd.date_range(out.index[0], out.index[-1], freq=rule, name=out.index.name)
+            if len(full) != len(out):
+                out = out.reindex(full)
+                out["volume"] = out["volume"].fillna(0.0)
+        # Once the ring has wrapped, evicted ticks must leave the bars too: drop bars that are entirely
+        # gone and rebuild the oldest, partially evicted one from the ticks still in the ring
+        head = self._oldest_bar(buf, rule)
+        if head is not None:
+            bucket, values = head
+            if out.index[0] < bucket:
+                out = out[out.index >= bucket]
+            if out.empty or out.index[0] != bucket:
+                return None
+            out = out.copy()
+            out.iloc[0] = values
+        return out, written
+
+    # Ring buffer storage
+    def _new_buffer(self) -> dict:
+        n = self._capacity
+        return {
+            "ts": np.empty(n, dtype="int64"),
+            "price": np.empty(n, dtype="float64"),
+            "size": np.empty(n, dtype="float64"),
+            "written": 0,  # total ticks ever written; slot = written % capacity
+        }
+
+    def _append_tick(self, t: Tick):
+        buf = self._buf.get(t.symbol)
+        if buf is None:
+            buf = self._buf[t.symbol] = self._new_buffer()
+        seq = buf["written"]
+        head = seq % self._capacity
+        buf["ts"][head] = t.ts
+        buf["price"][head] = t.price
+        buf["size"][head] = t.size
+        # Publish only after the data stores; a single int store is atomic under the GIL
+        buf["written"] = seq + 1
+
+    def _snapshot(self, buf: dict, from_seq: int = 0, to_seq: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, int]:
+        # Copy ticks with sequence numbers [start, min(to_seq, written)) without locking. Returns the arrays
+        # plus start (> from_seq if older ticks were already evicted) and the written cursor used.
+        n = self._capacity
+        written = buf["written"]  # read the published cursor once
+        end = written if to_seq is None else min(to_seq, written)
+        start = max(from_seq, written - n)  # sequence number of the oldest entry in the snapshot
+        count = max(0, end - start)
+        i0 = start % n
+        if i0 + count <= n:
+            ts = buf["ts"][i0:i0 + count].copy()
+            price = buf["price"][i0:i0 + count].copy()
+            size = buf["size"][i0:i0 + count].copy()
+        else:
+            # Region wraps around the end of the buffer
+            i1 = end % n
+            ts = np.concatenate((buf["ts"][i0:], buf["ts"][:i1]))
+            price = np.concatenate((buf["price"][i0:], buf["price"][:i1]))
+            size = np.concatenate((buf["size"][i0:], buf["size"][:i1]))
+        # The producer may have overwritten the oldest slots while we copied (plus one write in flight)
+        stale = min(count, max(0, buf["written"] - n + 1 - start))
+        if stale:
+            ts, price, size = ts[stale:], price[stale:], size[stale:]
+        return ts, price, size, start + stale, written
+
+    def _oldest_bar(self, buf: dict, rule: str) -> Optional[Tuple[pd.Timestamp, list]]:
+        # (bucket, [open, high, low, close, volume]) of the oldest bar, from the ticks still in the ring,
+        # or None if the buffer has never wrapped. Reads only the head of the ring, growing the chunk
+        # until it passes the end of that bar; ticks are assumed to arrive (nearly) in time order.
+        n = self._capacity
+        written = buf["written"]
+        if written < n:
+            return None  # at written == n, _snapshot already treats the oldest slot as in flight
+        seq = written - n + 1  # skip the slot a write may be in flight on (as _snapshot does)
+        chunk = 256
+        parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        bucket = end_ns = None
+        while True:
+            ts, price, size, start, written = self._snapshot(buf, from_seq=seq, to_seq=seq + chunk)
+            if start != seq and parts:
+                # The producer overwrote the head while we read; start over from the new head
+                parts, bucket = [], None
+            if ts.shape[0] == 0:
+                break
+            if bucket is None:
+                bucket = pd.Timestamp(int(ts[0]), unit="ns", tz="UTC").floor(rule)
+                end_ns = (bucket + pd.tseries.frequencies.to_offset(rule)).value
+            parts.append((ts, price, size))
+            seq = start + ts.shape[0]
+            if ts[-1] >= end_ns or seq >= written:
+                break
+            chunk *= 2
+        if not parts:
+            return None
+        ts, price, size = (np.concatenate(a) for a in zip(*parts))
+        mask = ts < end_ns
+        ts, price, size = ts[mask], price[mask], size[mask]
+        if ts.shape[0] == 0 or ts.min() < bucket.value:
+            return None  # out-of-order ticks; let the caller fall back to a full resample
+        if not (ts[1:] >= ts[:-1]).all():
+            order = np.argsort(ts, kind="stable")
+            price, size = price[order], size[order]
+        return bucket, [price[0], price.max(), price.min(), price[-1], size.sum()]
+
+    @staticmethod
+    def _ticks_frame(ts: np.ndarray, price: np.ndarray, size: np.ndarray) -> pd.DataFrame:
+        index = pd.DatetimeIndex(pd.to_datetime(ts, unit="ns", utc=True), name="ts")
+        df = pd.DataFrame({"price": price, "size": size}, index=index)
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        return df
 
     # Internal async machinery
     def _run_loop(self):
@@ -105,13 +272,14 @@ class MarketDataManager:
                     backoff = 1
                     while True:
                         raw = await ws.recv()
+                        if (_TRADE_MARKER_BYTES if isinstance(raw, bytes) else _TRADE_MARKER_STR) not in raw:
+                            continue
                         try:
-                            msg = json.loads(raw)
+                            msg = orjson.loads(raw)
                             if msg.get("e") == "trade":
                                 t = normalize_trade(msg)
                                 if t:
-                                    with self._lock:
-                                        self._ticks[t.symbol].append(t)
+                                    self._append_tick(t)
                         except Exception:
                             continue
             except asyncio.CancelledError:
@@ -121,12 +289,14 @@ class MarketDataManager:
                 backoff = min(backoff * 2, 30)
 
     def _cancel_all(self):
-        for s, task in list(self._ws_tasks.items()):
-            task.cancel()
-        self._ws_tasks.clear()
+        with self._lock:
+            for s, task in list(self._ws_tasks.items()):
+                task.cancel()
+            self._ws_tasks.clear()
 
     def _restart(self, symbols: List[str]):
-        self._cancel_all()
-        for sym in symbols:
-            task = self._loop.create_task(self._connect_symbol(sym))
-            self._ws_tasks[sym] = task
+        with self._lock:
+            self._cancel_all()
+            for sym in symbols:
+                task = self._loop.create_task(self._connect_symbol(sym))
+                self._ws_tasks[sym] = task
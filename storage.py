@@ -1,24 +1,290 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow
+import pyarrow.compute
+import pyarrow.dataset
+import pyarrow.parquet
 import sqlite3
 
 
+log = logging.getLogger(__name__)
+
+# Conservative host-parameter limit (SQLITE_MAX_VARIABLE_NUMBER before 3.32); multi-row
+# statements bind BATCH_ROWS rows at once, sized to stay under it
+SQLITE_MAX_PARAMS = 999
+
+TICK_COLS = ("symbol", "ts", "price", "size")
+OHLCV_COLS = ("symbol", "bucket", "timeframe", "open", "high", "low", "close", "volume")
+# symbol (and timeframe) are inlined into the insert SQL, so only these are bound per row
+TICK_BOUND_COLS = ("ts", "price", "size")
+OHLCV_BOUND_COLS = ("bucket", "open", "high", "low", "close", "volume")
+TICKS_BATCH_ROWS = max(1, SQLITE_MAX_PARAMS // len(TICK_BOUND_COLS))
+OHLCV_BATCH_ROWS = max(1, SQLITE_MAX_PARAMS // len(OHLCV_BOUND_COLS))
+# Background writer: most queued calls folded into one transaction, and queue bound (see drop_when_full)
+WRITER_BATCH_ITEMS = 256
+WRITER_QUEUE_SIZE = 1000
+# Parquet sink: changed bars are merged into their day file at most this often (and on flush/close)
+PARQUET_FLUSH_SECONDS = 60.0
+US_PER_DAY = 86_400_000_000
+
+_OHLCV_CONFLICT = """
+    ON CONFLICT(symbol, bucket, timeframe) DO UPDATE SET
+        open=excluded.open,
+        high=excluded.high,
+        low=excluded.low,
+        close=excluded.close,
+        volume=excluded.volume
+"""
+
+
+# Symbols/timeframes come from user input; only plain identifiers may be inlined into SQL
+_SQL_LITERAL_RE = re.compile(r"[A-Za-z0-9_.\-]+")
+
+
+def _sql_literal(value: str) -> str:
+    # fullmatch: '$' would also accept a trailing newline
+    if not isinstance(value, str) or not _SQL_LITERAL_RE.fullmatch(value):
+        raise ValueError(f"Invalid symbol/timeframe for storage: {value!r}")
+    return f"'{value}'"
+
+
+@lru_cache(maxsize=256)
+def _ohlcv_upsert_sql(symbol: str, timeframe: str, n_rows: int) -> str:
+    # Cached so each (symbol, timeframe) reuses the same SQL text and prepared statement
+    row = f"({_sql_literal(symbol)}, ?, {_sql_literal(timeframe)}, ?, ?, ?, ?, ?)"
+    return f"INSERT INTO ohlcv({', '.join(OHLCV_COLS)}) VALUES " + ", ".join([row] * n_rows) + _OHLCV_CONFLICT
+
+
+@lru_cache(maxsize=256)
+def _ticks_insert_sql(symbol: str, n_rows: int) -> str:
+    # Same as _ohlcv_upsert_sql: no per-row symbol column has to be built or bound
+    row = f"({_sql_literal(symbol)}, ?, ?, ?)"
+    return f"INSERT INTO ticks({', '.join(TICK_COLS)}) VALUES " + ", ".join([row] * n_rows)
+
+
+def to_iso(us):
+    # Stored timestamps are INTEGER epoch microseconds (UTC); format one value or an array as ISO8601
+    return np.datetime_as_string(np.asarray(us, dtype="int64").astype("datetime64[us]"), unit="us", timezone="UTC")
+
+
+def _epoch_us(values) -> np.ndarray:
+    # Datetime-like values -> int64 epoch microseconds; naive values are taken as UTC
+    return pd.DatetimeIndex(values).as_unit("us").asi8
+
+
+def _tick_columns(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Read columns straight from df (ts is the index, or a 'ts' column); no reset_index()/copy.
+    # ticks columns are NOT NULL: rows with NaT/NaN are dropped here rather than aborting (and
+    # rolling back) the whole batch mid-insert; non-numeric columns fail before any write.
+    ts = pd.DatetimeIndex(df["ts"] if "ts" in df.columns else df.index)
+    price = df["price"].to_numpy(dtype="float64")
+    size = df["size"].to_numpy(dtype="float64")
+    bad = np.isnan(price) | np.isnan(size)
+    if ts.hasnans:
+        bad |= ts.isna()
+    ts_us = _epoch_us(ts)
+    if bad.any():
+        return ts_us[~bad], price[~bad], size[~bad]
+    return ts_us, price, size
+
+
+def _ohlcv_buckets(df: pd.DataFrame) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # Bucket is the resample timestamp: an explicit 'bucket' column, else the index.
+    # Returns epoch microseconds and a mask of rows whose bucket is a valid timestamp (None if all are).
+    bucket = df["bucket"] if "bucket" in df.columns else df.index
+    if isinstance(bucket, pd.DatetimeIndex) and not bucket.hasnans:
+        # Common case (resampled frame): already datetime64, and hasnans is cached on the index
+        return _epoch_us(bucket), None
+    dt = pd.DatetimeIndex(pd.to_datetime(bucket, utc=True, errors="coerce"))
+    valid = ~dt.isna()
+    return _epoch_us(dt), (None if valid.all() else valid)
+
+
+def _nan_to_none(values: np.ndarray) -> list:
+    # NaN binds as NULL either way, but NaN != NaN would make rows holding it (empty gap bars) never
+    # compare equal to the last-upsert cache; None does
+    out = values.tolist()
+    if values.dtype.kind == "f":
+        nan = np.flatnonzero(np.isnan(values))
+        for i in nan.tolist():
+            out[i] = None
+    return out
+
+
+def _utc_timestamp(value) -> pd.Timestamp:
+    # Naive values are taken as UTC, like everywhere else in storage
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _iso_to_us(text):
+    # Used once to migrate databases that still store ISO8601 TEXT timestamps
+    try:
+        return pd.Timestamp(text).value // 1000
+    except Exception:
+        return None
+
+
+def _execute_batched(con: sqlite3.Connection, rows: List[tuple], batch_sql: str, batch_rows: int, one_sql: str):
+    # Full batches go through the multi-row statement; the remainder through executemany
+    n_full = len(rows) // batch_rows * batch_rows
+    for i in range(0, n_full, batch_rows):
+        con.execute(batch_sql, [v for r in rows[i:i + batch_rows] for v in r])
+    if n_full < len(rows):
+        con.executemany(one_sql, rows[n_full:])
+
+
 class Storage:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, buffer_rows: int = 0, background: bool = False, drop_when_full: bool = False, parquet_dir: Optional[Path] = None):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # One long-lived connection; autocommit mode so transactions are explicit (see _transaction).
+        # The SQL text is built once (_ticks_insert_sql, _ohlcv_upsert_sql), so every call hits the
+        # connection's prepared-statement cache instead of re-parsing.
+        self.con = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, cached_statements=1024)
+        # WAL lets the UI read while the background writer commits; NORMAL avoids an fsync per commit
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA temp_store=MEMORY")
+        self.con.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        self.con.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        # The connection is shared across threads; serialise transactions on it
+        self._lock = threading.Lock()
+        # (symbol, timeframe) -> {bucket: row} as last written; bars that haven't changed since are skipped
+        self._last_upsert: Dict[Tuple[str, str], Dict[int, tuple]] = {}
+        # With buffer_rows > 0, writes accumulate here and are committed together once that many
+        # rows are pending (or on flush()/close()); 0 writes through on every call
+        self.buffer_rows = buffer_rows
+        self._buffer_lock = threading.Lock()
+        self._tick_buffer: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]] = []
+        self._tick_buffered = 0
+        self._ohlcv_buffer: Dict[Tuple[str, str], Dict[int, tuple]] = {}
+        # Optional columnar copy of the OHLCV table for analytical reads (see read_ohlcv_parquet):
+        # hive-partitioned symbol=/timeframe=/date=/part-0.parquet, one ZSTD file per day
+        self.parquet_dir = Path(parquet_dir) if parquet_dir else None
+        self._parquet_lock = threading.Lock()
+        self._parquet_pending: Dict[Tuple[str, str], Dict[int, tuple]] = {}
+        self._parquet_written_at = time.monotonic()
         self._init_db()
+        # With background=True, write calls only enqueue and return; one daemon thread owns all writes.
+        # Frames are read on that thread, so callers must not modify them after the call.
+        # When WRITER_QUEUE_SIZE items are pending, a write call blocks until the writer catches up; with
+        # drop_when_full=True it returns at once and the write is discarded (counted in dropped_writes),
+        # for callers that must never stall and re-send their data anyway, like periodic snapshots.
+        self.drop_when_full = drop_when_full
+        self.dropped_writes = 0
+        self._write_q: "queue.Queue" = queue.Queue(maxsize=WRITER_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        if background:
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.con.execute("BEGIN")
+            try:
+                yield self.con
+            except Exception:
+                if self.con.in_transaction:
+                    self.con.execute("ROLLBACK")
+                raise
+            if self.con.in_transaction:
+                self.con.execute("COMMIT")
+
+    def close(self):
+        if self._writer is not None:
+            self._write_q.put(None)  # processed after everything queued before it
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._lock:
+            self.con.close()
+
+    def flush(self):
+        # Wait for queued writes, then commit everything buffered so far in one transaction
+        if self._writer is not None:
+            self._write_q.join()
+        self._flush_buffer()
+        self._flush_parquet()
+
+    def _flush_buffer(self):
+        with self._buffer_lock:
+            ticks, ohlcv = self._tick_buffer, self._ohlcv_buffer
+            self._tick_buffer, self._tick_buffered, self._ohlcv_buffer = [], 0, {}
+        if ticks or ohlcv:
+            self._write(ticks, ohlcv)
+
+    def _buffer_full(self) -> bool:
+        return self._tick_buffered + sum(len(bars) for bars in self._ohlcv_buffer.values()) >= self.buffer_rows
+
+    def _enqueue(self, item: tuple):
+        if not self.drop_when_full:
+            self._write_q.put(item)
+            return
+        try:
+            self._write_q.put_nowait(item)
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def _writer_loop(self):
+        # Drain whatever has queued up (up to WRITER_BATCH_ITEMS) into a single transaction
+        while True:
+            items = [self._write_q.get()]
+            while len(items) < WRITER_BATCH_ITEMS:
+                try:
+                    items.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+            ticks, ohlcv = [], {}
+            for item in items:
+                # Convert per item so one malformed frame doesn't take the rest of the batch with it
+                try:
+                    if item is None:
+                        continue
+                    if item[0] == "ticks":
+                        ticks.append(self._tick_chunk(item[1], item[2]))
+                    else:
+                        for key, bars in self._ohlcv_groups(item[1]).items():
+                            ohlcv.setdefault(key, {}).update(bars)
+                except Exception:
+                    log.exception("Dropping invalid %s write", item[0])
+            try:
+                self._submit(ticks, ohlcv)
+            except Exception:
+                # Callers have already returned, so there is no one to raise to
+                log.exception("Background write of %d queued item(s) failed", len(items))
+            for _ in items:
+                self._write_q.task_done()
+            if any(item is None for item in items):
+                return
 
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as con:
+        with self._transaction() as con:
             cur = con.cursor()
+            # Earlier versions stored ts/bucket as ISO8601 TEXT; move those tables aside to convert below
+            legacy = []
+            for table, col in (("ticks", "ts"), ("ohlcv", "bucket")):
+                types = {r[1]: r[2].upper() for r in cur.execute(f"PRAGMA table_info({table})")}
+                if types.get(col) == "TEXT":
+                    cur.execute(f"ALTER TABLE {table} RENAME TO {table}_text")
+                    legacy.append((table, col))
             cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS ticks (
                     symbol TEXT NOT NULL,
-                    ts TEXT NOT NULL,
+                    ts INTEGER NOT NULL,  -- epoch microseconds (UTC)
                     price REAL NOT NULL,
                     size REAL NOT NULL
                 )
@@ -28,69 +294,290 @@ class Storage:
                 """
                 CREATE TABLE IF NOT EXISTS ohlcv (
                     symbol TEXT NOT NULL,
-                    bucket TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,  -- epoch microseconds (UTC)
                     timeframe TEXT NOT NULL,
                     open REAL, high REAL, low REAL, close REAL, volume REAL,
                     PRIMARY KEY(symbol, bucket, timeframe)
                 )
                 """
             )
-            con.commit()
+            if legacy:
+                con.create_function("iso_to_us", 1, _iso_to_us, deterministic=True)
+                for table, col in legacy:
+                    cols = TICK_COLS if table == "ticks" else OHLCV_COLS
+                    select = ", ".join(f"iso_to_us({c})" if c == col else c for c in cols)
+                    cur.execute(
+                        f"INSERT OR REPLACE INTO {table}({', '.join(cols)}) "
+                        f"SELECT {select} FROM {table}_text WHERE iso_to_us({col}) IS NOT NULL"
+                    )
+                    cur.execute(f"DROP TABLE {table}_text")
+
+    def finalize_bulk_load(self):
+        # ticks has no index while ingesting (no B-tree upkeep per insert); call once loading is done
+        # so per-symbol time-range reads become index lookups instead of full scans
+        with self._lock:
+            self.con.execute("CREATE INDEX IF NOT EXISTS idx_ticks_sym_ts ON ticks(symbol, ts)")
+            self.con.execute("ANALYZE")
 
     def append_ticks(self, df: pd.DataFrame, symbol: str):
         if df.empty:
             return
-        out = df.reset_index()[["ts", "price", "size"]].copy()
-        out["symbol"] = symbol
-        out = out[["symbol", "ts", "price", "size"]]
-        with sqlite3.connect(self.db_path) as con:
-            out.to_sql("ticks", con, if_exists="append", index=False)
+        if self._writer is not None:
+            self._enqueue(("ticks", df, symbol))
+            return
+        self._submit([self._tick_chunk(df, symbol)], {})
 
     def upsert_ohlcv(self, df: pd.DataFrame, symbol: str, timeframe: str):
-        if df.empty:
+        self.upsert_ohlcv_batch([(df, symbol, timeframe)])
+
+    def upsert_ohlcv_batch(self, items: Iterable[Tuple[pd.DataFrame, str, str]]):
+        # Upsert several (df, symbol, timeframe) snapshots in a single transaction
+        items = [item for item in items if not item[0].empty]
+        if not items:
+            return
+        if self._writer is not None:
+            self._enqueue(("ohlcv", items))
             return
-        out = df.reset_index().copy()
-        # Ensure a 'bucket' column exists representing the resample timestamp bucket
-        if "bucket" not in out.columns:
-            if "index" in out.columns:
-                out = out.rename(columns={"index": "bucket"})
-            else:
-                # If the index had a name, rename that column; otherwise create from first column
-                idx_name = df.index.name
-                if idx_name and idx_name in out.columns:
-                    out = out.rename(columns={idx_name: "bucket"})
-                else:
-                    # As a fallback, construct bucket from the original index values
-                    out["bucket"] = df.index.to_series().values
-        out["symbol"] = symbol
-        out["timeframe"] = timeframe
-        # Convert bucket to ISO8601 string for SQLite compatibility
-        # Normalize bucket to ISO8601 string for SQLite
+        self._submit([], self._ohlcv_groups(items))
+
+    @staticmethod
+    def _tick_chunk(df: pd.DataFrame, symbol: str) -> Tuple[str, np.ndarray, np.ndarray, np.ndarray]:
+        # Validate the symbol here, per item, rather than inside the transaction that writes a whole batch
+        _ticks_insert_sql(symbol, 1)
+        return (symbol, *_tick_columns(df))
+
+    def _ohlcv_groups(self, items: Iterable[Tuple[pd.DataFrame, str, str]]) -> Dict[Tuple[str, str], Dict[int, tuple]]:
+        groups: Dict[Tuple[str, str], Dict[int, tuple]] = {}
+        for df, symbol, timeframe in items:
+            if df.empty:
+                continue  # nothing to write, so nothing to validate
+            _ohlcv_upsert_sql(symbol, timeframe, 1)  # validates symbol/timeframe; see _tick_chunk
+            # A multi-row upsert may not touch the same key twice; keep the last version of each bar
+            bars = groups.setdefault((symbol, timeframe), {})
+            for r in self._ohlcv_rows(df):
+                bars[r[0]] = r
+        return {k: v for k, v in groups.items() if v}
+
+    def _submit(self, ticks: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]], ohlcv: Dict[Tuple[str, str], Dict[int, tuple]]):
+        if not ticks and not ohlcv:
+            return
+        if not self.buffer_rows:
+            self._write(ticks, ohlcv)
+            return
+        with self._buffer_lock:
+            for symbol, ts, price, size in ticks:
+                # Copy: the caller may reuse the frame before the buffer is flushed
+                self._tick_buffer.append((symbol, ts.copy(), price.copy(), size.copy()))
+                self._tick_buffered += len(ts)
+            # Keyed by bucket, so a later version of a buffered bar simply replaces the earlier one
+            for key, bars in ohlcv.items():
+                self._ohlcv_buffer.setdefault(key, {}).update(bars)
+            full = self._buffer_full()
+        if full:
+            self._flush_buffer()  # not flush(): this may run on the writer thread, which can't join its own queue
+
+    def _write(self, ticks: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]], ohlcv: Dict[Tuple[str, str], Dict[int, tuple]]):
         try:
-            # Ensure timezone-aware UTC and format
-            dt = pd.to_datetime(out["bucket"], utc=True, errors="coerce")
-            # If conversion failed for some rows, fill using astype(str)
-            if dt.isna().any():
-                out["bucket"] = out["bucket"].astype(str)
-            else:
-                out["bucket"] = dt.dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            with self._transaction() as con:
+                for symbol, ts, price, size in ticks:
+                    rows = list(zip(ts.tolist(), price.tolist(), size.tolist()))
+                    # Plain DB-API parameter binding; bypasses pandas' SQL layer
+                    _execute_batched(
+                        con,
+                        rows,
+                        _ticks_insert_sql(symbol, TICKS_BATCH_ROWS),
+                        TICKS_BATCH_ROWS,
+                        _ticks_insert_sql(symbol, 1),
+                    )
+                changed = {}
+                for key, bars in ohlcv.items():
+                    last = self._last_upsert.get(key, {})
+                    rows = [r for bucket, r in bars.items() if last.get(bucket) != r]
+                    if rows:
+                        changed[key] = rows
+                        symbol, timeframe = key
+                        _execute_batched(
+                            con,
+                            rows,
+                            _ohlcv_upsert_sql(symbol, timeframe, OHLCV_BATCH_ROWS),
+                            OHLCV_BATCH_ROWS,
+                            _ohlcv_upsert_sql(symbol, timeframe, 1),
+                        )
+                # Snapshots are the latest bars, so keeping only the newest one per key bounds the cache
+                self._last_upsert.update(ohlcv)
         except Exception:
-            out["bucket"] = out["bucket"].astype(str)
-        cols = ["symbol", "bucket", "timeframe", "open", "high", "low", "close", "volume"]
-        out = out[cols]
-        with sqlite3.connect(self.db_path) as con:
-            cur = con.cursor()
-            cur.executemany(
+            self._last_upsert.clear()  # unsure what was committed
+            raise
+        if self.parquet_dir is not None and changed:
+            with self._parquet_lock:
+                for key, rows in changed.items():
+                    self._parquet_pending.setdefault(key, {}).update((r[0], r) for r in rows)
+            if time.monotonic() - self._parquet_written_at >= PARQUET_FLUSH_SECONDS:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        if self.parquet_dir is None:
+            return
+        with self._parquet_lock:
+            pending, self._parquet_pending = self._parquet_pending, {}
+            self._parquet_written_at = time.monotonic()
+            for (symbol, timeframe), bars in pending.items():
+                columns = list(zip(*bars.values()))
+                bucket = np.asarray(columns[0], dtype="int64")
+                day = bucket // US_PER_DAY
+                for d in np.unique(day):
+                    mask = day == d
+                    table = pyarrow.table({
+                        "bucket": pyarrow.array(bucket[mask].astype("datetime64[us]"), type=pyarrow.timestamp("us", tz="UTC")),
+                        **{col: pyarrow.array(np.asarray(c, dtype="float64")[mask]) for col, c in zip(OHLCV_BOUND_COLS[1:], columns[1:])},
+                    })
+                    self._merge_parquet_day(symbol, timeframe, int(d), table)
+
+    def _merge_parquet_day(self, symbol: str, timeframe: str, day: int, table: pyarrow.Table):
+        # Upsert into the day's file: existing bars with the same bucket are replaced by the new ones
+        date = np.datetime_as_string(np.datetime64(day, "D"))
+        path = self.parquet_dir / f"symbol={symbol}" / f"timeframe={timeframe}" / f"date={date}" / "part-0.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            old = pyarrow.parquet.read_table(path)
+            keep = pyarrow.compute.invert(pyarrow.compute.is_in(old["bucket"], value_set=table["bucket"]))
+            table = pyarrow.concat_tables([old.filter(keep), table])
+        # Leading '.' so pyarrow.dataset skips it if it is ever left behind (crash) or seen mid-write
+        tmp = path.with_name("." + path.name + ".tmp")
+        pyarrow.parquet.write_table(table.sort_by("bucket"), tmp, compression="zstd")
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    def read_ohlcv_parquet(self, symbol: str, timeframe: str, start=None, end=None) -> pd.DataFrame:
+        # Partition pruning on symbol/timeframe, row-group statistics pushdown on the bucket range
+        self.flush()  # include queued and buffered writes
+        if self.parquet_dir is None or not self.parquet_dir.exists():
+            return pd.DataFrame(columns=list(OHLCV_BOUND_COLS[1:]))
+        dataset = pyarrow.dataset.dataset(self.parquet_dir, format="parquet", partitioning="hive")
+        expr = (pyarrow.dataset.field("symbol") == symbol) & (pyarrow.dataset.field("timeframe") == timeframe)
+        bucket = pyarrow.dataset.field("bucket")
+        if start is not None:
+            expr &= bucket >= _utc_timestamp(start)
+        if end is not None:
+            expr &= bucket < _utc_timestamp(end)
+        table = dataset.to_table(columns=list(OHLCV_BOUND_COLS), filter=expr)
+        return table.to_pandas().set_index("bucket").sort_index()
+
+    @staticmethod
+    def _ohlcv_rows(df: pd.DataFrame) -> List[tuple]:
+        if df.empty:
+            return []
+        # Read straight from df; no reset_index()/copy of the frame.
+        # Rows whose bucket is not a timestamp can't be keyed and are skipped.
+        bucket_us, valid = _ohlcv_buckets(df)
+        columns = [bucket_us] + [df[col].to_numpy() for col in OHLCV_BOUND_COLS[1:]]
+        if valid is not None:
+            columns = [c[valid] for c in columns]
+        return list(zip(*(_nan_to_none(c) for c in columns)))
+
+
+class DuckDBStorage:
+    # Columnar alternative to Storage with the same interface; needs the optional duckdb package.
+    # Writes register the batch as an Arrow table and run one INSERT ... SELECT over it.
+    def __init__(self, db_path: Path):
+        import duckdb
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = duckdb.connect(str(self.db_path))
+        # A DuckDB connection must not be used from several threads at once
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def close(self):
+        with self._lock:
+            self.con.close()
+
+    def flush(self):
+        pass  # writes are not buffered; kept for interface parity with Storage
+
+    def _init_db(self):
+        with self._lock:
+            self.con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ticks (
+                    symbol VARCHAR NOT NULL,
+                    ts BIGINT NOT NULL,  -- epoch microseconds (UTC)
+                    price DOUBLE NOT NULL,
+                    size DOUBLE NOT NULL
+                )
                 """
-                INSERT INTO ohlcv(symbol, bucket, timeframe, open, high, low, close, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(symbol, bucket, timeframe) DO UPDATE SET
-                    open=excluded.open,
-                    high=excluded.high,
-                    low=excluded.low,
-                    close=excluded.close,
-                    volume=excluded.volume
-                """,
-                [tuple(r) for r in out.to_records(index=False)],
             )
-            con.commit()
+            self.con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ohlcv (
+                    symbol VARCHAR NOT NULL,
+                    bucket BIGINT NOT NULL,  -- epoch microseconds (UTC)
+                    timeframe VARCHAR NOT NULL,
+                    open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE, volume DOUBLE,
+                    PRIMARY KEY(symbol, bucket, timeframe)
+                )
+                """
+            )
+
+    def finalize_bulk_load(self):
+        # DuckDB keeps min/max zone maps per row group, so time-range scans need no extra index
+        with self._lock:
+            self.con.execute("CHECKPOINT")
+
+    def append_ticks(self, df: pd.DataFrame, symbol: str):
+        if df.empty:
+            return
+        ts, price, size = _tick_columns(df)
+        if not len(ts):
+            return
+        # Columns wrapped as Arrow arrays; no intermediate DataFrame with a broadcast symbol column
+        table = pyarrow.table({
+            "symbol": pyarrow.repeat(pyarrow.scalar(symbol), len(ts)),
+            "ts": pyarrow.array(ts),
+            "price": pyarrow.array(price),
+            "size": pyarrow.array(size),
+        })
+        with self._lock:
+            self.con.register("ticks_in", table)
+            try:
+                self.con.execute(f"INSERT INTO ticks SELECT {', '.join(TICK_COLS)} FROM ticks_in")
+            finally:
+                self.con.unregister("ticks_in")
+
+    def upsert_ohlcv(self, df: pd.DataFrame, symbol: str, timeframe: str):
+        self.upsert_ohlcv_batch([(df, symbol, timeframe)])
+
+    def upsert_ohlcv_batch(self, items: Iterable[Tuple[pd.DataFrame, str, str]]):
+        # Columns go to DuckDB as Arrow buffers; no Python row tuples are built
+        tables = [self._ohlcv_table(df, symbol, timeframe) for df, symbol, timeframe in items if not df.empty]
+        tables = [t for t in tables if t.num_rows]
+        if not tables:
+            return
+        out = pyarrow.concat_tables(tables)
+        out = out.append_column("seq", pyarrow.array(np.arange(out.num_rows)))
+        with self._lock:
+            self.con.register("ohlcv_in", out)
+            try:
+                # One INSERT may not touch the same key twice; keep the last version of each bar
+                self.con.execute(
+                    f"INSERT INTO ohlcv SELECT {', '.join(OHLCV_COLS)} FROM ohlcv_in "
+                    "QUALIFY row_number() OVER (PARTITION BY symbol, bucket, timeframe ORDER BY seq DESC) = 1"
+                    + _OHLCV_CONFLICT
+                )
+            finally:
+                self.con.unregister("ohlcv_in")
+
+    @staticmethod
+    def _ohlcv_table(df: pd.DataFrame, symbol: str, timeframe: str) -> pyarrow.Table:
+        bucket_us, valid = _ohlcv_buckets(df)
+        columns = [bucket_us] + [df[col].to_numpy() for col in OHLCV_BOUND_COLS[1:]]
+        if valid is not None:
+            columns = [c[valid] for c in columns]
+        n = len(columns[0])
+        # pyarrow.array wraps the float64/int64 numpy buffers without copying
+        return pyarrow.table({
+            "symbol": pyarrow.repeat(pyarrow.scalar(symbol), n),
+            "bucket": pyarrow.array(columns[0]),
+            "timeframe": pyarrow.repeat(pyarrow.scalar(timeframe), n),
+            # from_pandas: NaN (empty gap bars) becomes NULL, as it does when SQLite binds it
+            **{col: pyarrow.array(c, from_pandas=True) for col, c in zip(OHLCV_BOUND_COLS[1:], columns[1:])},
+        })